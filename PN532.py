@@ -3,37 +3,82 @@ This MicroPython module lets you communicate with the PN532 nfc/rfid module over
 It also covers auth/read/write on a mifare card.
 """
 
+import micropython # pyright: ignore
+from micropython import const # pyright: ignore
 from time import sleep_ms, ticks_ms, ticks_diff # pyright: ignore
 
+# debug output is compiled out unless this is set to 1, even with debug=True
+_DEBUG = const(0)
+
 _ACK = b"\x00\x00\xFF\x00\xFF\x00"
 _NACK = b"\x00\x00\xFF\xFF\x00\x00"
-_PN532_ADDR = 0x24
-_PREAMBLE = 0x00
-_POSTAMBLE = 0x00
-_START_CODE_1 = 0x00
-_START_CODE_2 = 0xFF
-_TFI_H2M = 0xD4
-_TFI_M2H = 0xD5
+_ACK_WITH_RDY = b"\x01" + _ACK
+_PN532_ADDR = const(0x24)
+_PREAMBLE = const(0x00)
+_POSTAMBLE = const(0x00)
+_START_CODE_1 = const(0x00)
+_START_CODE_2 = const(0xFF)
+_TFI_H2M = const(0xD4)
+_TFI_M2H = const(0xD5)
+_HDR = bytes([_PREAMBLE, _START_CODE_1, _START_CODE_2])
 
-_CMD_GetFirmwareVersion = 0x02
-_CMD_GetGeneralStatus = 0x04
-_CMD_SAM_CONFIGURATION = 0x14
-_CMD_PowerDown = 0x16
-_CMD_InListPassiveTarget = 0x4A
-_CMD_InDataExchange = 0x40
+_CMD_GetFirmwareVersion = const(0x02)
+_CMD_GetGeneralStatus = const(0x04)
+_CMD_SAM_CONFIGURATION = const(0x14)
+_CMD_PowerDown = const(0x16)
+_CMD_InListPassiveTarget = const(0x4A)
+_CMD_InDataExchange = const(0x40)
 
-_MIFARE_AUTH_A = 0x60
-_MIFARE_AUTH_B = 0x61
-_MIFARE_READ = 0x30
-_MIFARE_WRITE = 0xA0
-_MIFARE_INCREMENT = 0xC1
-_MIFARE_DECREMENT = 0xC0
+_MIFARE_AUTH_A = const(0x60)
+_MIFARE_AUTH_B = const(0x61)
+_MIFARE_READ = const(0x30)
+_MIFARE_WRITE = const(0xA0)
+_MIFARE_INCREMENT = const(0xC1)
+_MIFARE_DECREMENT = const(0xC0)
 
-A = 0x00
-B = 0x01
+A = const(0x00)
+B = const(0x01)
 DEFAULT_KEYA = DEFAULT_KEYB = [0xFF]*6
 
 
+@micropython.viper
+def _bsum(buf: ptr8, n: int) -> int: # pyright: ignore
+    """
+    Returns the sum of the first n bytes of buf modulo 256
+    """
+    s = 0
+    for i in range(n):
+        s += buf[i]
+    return s & 0xFF
+
+
+_FRAME_ERRORS = ("Not ready", "Invalid response", "Length checksum doesn't match",
+                 "Frame not read completely", "Data checksum doesn't match")
+
+@micropython.viper
+def _parse_frame(p: ptr8, n: int) -> int: # pyright: ignore
+    """
+    Validates a frame read with its leading ready byte, n being the max payload length
+    returns the frame length or -(i + 1) where i indexes the error in _FRAME_ERRORS
+    """
+    if p[0] != 0x01:
+        return -1
+    if p[1] != _PREAMBLE or p[2] != _START_CODE_1 or p[3] != _START_CODE_2:
+        return -2
+    l = p[4]
+    if (l + p[5]) & 0xFF != 0x00:
+        return -3
+    if n < l:
+        return -4
+    if p[6] != _TFI_M2H or p[l + 7] != 0x00:
+        return -2
+    s = 0
+    for i in range(6, l + 7):
+        s += p[i]
+    if s & 0xFF != 0x00:
+        return -5
+    return l
+
 
 
 class PN532_I2C:
@@ -44,6 +89,13 @@ class PN532_I2C:
         self.i2c = i2c
         self.debug = debug
         self.pow_down = False
+        self._rxbuf = bytearray(64)
+        self._mv = memoryview(self._rxbuf)
+        self._parambuf = bytearray(19)
+        # largest frame sent is a MIFARE write: 9 framing bytes + 19 params
+        self._txbuf = bytearray(32)
+        self._txmv = memoryview(self._txbuf)
+        self._ackbuf = bytearray(len(_ACK_WITH_RDY))
 
     def write_rawdata(self, data):
         """
@@ -54,78 +106,114 @@ class PN532_I2C:
     def read_rawdata(self, n=6, retries=6, retry_delay=10):
         """
         Try to read n bytes for a certain amout of times: if it fails it raises an error,
-        if it succeed it ruturn a bytes object
+        if it succeed it ruturn a memoryview on the internal receive buffer,
+        which is only valid until the next read
         """
+        # reads larger than the receive buffer get a one-off buffer
+        mv = self._mv[:n] if n <= len(self._rxbuf) else memoryview(bytearray(n))
         for _ in range(retries):
             try:
-                return self.i2c.readfrom(_PN532_ADDR, n)
+                self.i2c.readfrom_into(_PN532_ADDR, mv)
+                return mv
             except OSError:
-                if self.debug: print("reading failed, retrying ...")
+                if _DEBUG and self.debug: print("reading failed, retrying ...")
                 sleep_ms(retry_delay)
         raise OSError("Read failed after retries")
 
+    def read_rawdata_try(self, n=1):
+        """
+        Try to read n bytes once: returns None if it fails,
+        otherwise a memoryview on the internal receive buffer which is only valid until the next read
+        """
+        # reads larger than the receive buffer get a one-off buffer
+        mv = self._mv[:n] if n <= len(self._rxbuf) else memoryview(bytearray(n))
+        try:
+            self.i2c.readfrom_into(_PN532_ADDR, mv)
+        except OSError:
+            return None
+        return mv
+
     def read_frame(self, n=32):
         """
         Read a frame of data with max length of n, if the operation fails of the returned frame is invalid it raises an error
-        otherwise it returns the bytes from the TFI (included) to the POSTAMBLE (included)
+        otherwise it returns a memoryview on the payload following the TFI,
+        which is only valid until the next read
         """
-        if self.debug: print("Reading frame ...")
+        if _DEBUG and self.debug: print("Reading frame ...")
         res = self.read_rawdata(n + 8)
-        if self.debug: print(f" received frame: {res.hex(" ")}\n")
-        if res[0] != 0x01:
-            raise OSError("Not ready")
-        if res[1] != _PREAMBLE or res[2] != _START_CODE_1 or res[3] != _START_CODE_2:
-            raise OSError("Invalid response")
-        l = res[4]
-        lcs = res[5]
-        if (l + lcs) & 0xFF != 0x00:
-            raise OSError("Length checksum doesn't match")
-        if n < l:
-            raise OSError("Frame not read completely")
-        if res[6] != _TFI_M2H or res[l + 7] != 0x00:
-            raise OSError("Invalid response")
-        if sum(res[6:l + 7]) & 0xFF != 0x00:
-            raise OSError("Data checksum doesn't match")
+        if _DEBUG and self.debug: print(f" received frame: {bytes(res).hex(" ")}\n")
+        l = _parse_frame(res, n)
+        if l < 0:
+            raise OSError(_FRAME_ERRORS[-l - 1])
         return res[7:l + 6]
 
+    def read_ack(self):
+        """
+        Reads the ready byte followed by the ACK frame without retrying,
+        returns the internal ACK buffer
+        """
+        self.i2c.readfrom_into(_PN532_ADDR, self._ackbuf)
+        return self._ackbuf
+
+    @micropython.native
     def wait_ready(self, timeout=1000, retry_delay=5):
         """
             Waits a certain amount for the PN532 to return a ready byte,
             if received returns True else if timeout expire reture False
+            the delay between polls starts at 1 ms and doubles up to retry_delay
         """
-        if self.debug: print("Waiting for device to be ready ...")
-        timestamp = ticks_ms()
-        while timeout is None or ticks_diff(ticks_ms(), timestamp) < timeout:
-            try:
-                sleep_ms(retry_delay)
-                r = self.read_rawdata(1)
-                if r and r[0] == 0x01:
-                    if self.debug: print("Device ready ")
-                    return True
-            except OSError:
-                pass
-                if self.debug: print("Waiting timeout exceeded")
-                return False
+        # bind globals and attributes to locals for the polling loop
+        _tm = ticks_ms
+        _td = ticks_diff
+        _sl = sleep_ms
+        read = self.read_rawdata_try
+        debug = self.debug
+        if _DEBUG and debug: print("Waiting for device to be ready ...")
+        timestamp = _tm()
+        d = 1
+        while timeout is None or _td(_tm(), timestamp) < timeout:
+            r = read(1)
+            if r is not None and r[0] == 0x01:
+                if _DEBUG and debug: print("Device ready ")
+                return True
+            _sl(d)
+            d = min(d * 2, retry_delay)
+        if _DEBUG and debug: print("Waiting timeout exceeded")
+        return False
 
+    @micropython.native
     def write_cmd(self, cmd, params=None):
         """
         Write a command to the PN532 with given parameters;
-        parameters should be given as an array of intergers between 0 and 255
+        parameters should be given as an array of intergers between 0 and 255 or as a bytes-like object,
+        values are not masked so out of range integers raise an error
         if the write fails or the PN532 doesn't return an ACK signal it raises an error
         """
-        data = bytes([_TFI_H2M, cmd & 0xFF])
-        if params is not None:
-            data += bytes([p & 0xFF for p in params])
-
-        l = len(data)
-        lcs = 0xFF - l + 1
-        dcs = (0xFF - sum(data) + 1) & 0xFF
-        frame = bytes([_PREAMBLE, _START_CODE_1, _START_CODE_2, l, lcs]) + data + bytes([dcs, _POSTAMBLE])
-        if self.debug: print(f" Frame sent :{frame.hex(" ")}")
+        n = 0 if params is None else len(params)
+        l = n + 2
+        # commands larger than the transmit buffer get a one-off buffer
+        frame = self._txmv if l + 7 <= len(self._txbuf) else memoryview(bytearray(l + 7))
+        frame[0:3] = _HDR
+        frame[3] = l
+        frame[4] = (0x100 - l) & 0xFF
+        frame[5] = _TFI_H2M
+        frame[6] = cmd & 0xFF
+        if n:
+            frame[7:7 + n] = params if isinstance(params, (bytes, bytearray, memoryview)) else bytes(params)
+        frame[l + 5] = (0x100 - _bsum(frame[5:], l)) & 0xFF
+        frame[l + 6] = _POSTAMBLE
+        frame = frame[:l + 7]
+        if _DEBUG and self.debug: print(f" Frame sent :{bytes(frame).hex(" ")}")
         self.write_rawdata(frame)
-        if not self.wait_ready(): raise OSError("Device not ready")
-        ack = self.read_rawdata(len(_ACK) + 1)
-        if ack != b"\x01" + _ACK:
+        # the ACK is often available right away, only poll if it is not
+        try:
+            ack = self.read_ack()
+        except OSError:
+            ack = None
+        if ack is None or ack[0] != 0x01:
+            if not self.wait_ready(): raise OSError("Device not ready")
+            ack = self.read_ack()
+        if ack != _ACK_WITH_RDY:
             raise OSError("No ack received")
 
     def firmware_version(self):
@@ -133,43 +221,43 @@ class PN532_I2C:
         Returns the firmware version of the PN532 as an array having IC ver, Firmware ver, Frimware rev, support values
         Refer to the PN532 user-guide for more details
         """
-        if self.debug: print("Getting firmware version ...")
+        if _DEBUG and self.debug: print("Getting firmware version ...")
         self.write_cmd(_CMD_GetFirmwareVersion)
         if not self.wait_ready(): raise OSError("Device not ready")
         data = self.read_frame()
         if data[0] != _CMD_GetFirmwareVersion + 1:
             raise OSError("Invalid response")
-        if self.debug: print(f"Firmware version: {data[1:].hex(" ")}")
-        return data[1:]
+        data = bytes(data[1:])
+        if _DEBUG and self.debug: print(f"Firmware version: {data.hex(" ")}")
+        return data
 
     def general_status(self):
         """
         Returns the general status of the PN532 as an array which contains err code, RF field, number of targets,
         and depending on the number of targets either nothing or one/two tuples (tg, sens_res, sel_res, NFCIDLength)
         """
-        if self.debug: print("Getting general status ...")
+        if _DEBUG and self.debug: print("Getting general status ...")
         self.write_cmd(_CMD_GetGeneralStatus)
         if not self.wait_ready(): raise OSError("Device not ready")
         res = self.read_frame()
         if res[0] != _CMD_GetGeneralStatus + 1:
             raise OSError("Invalid response")
         tg = res[3]
-        res = list(res)
-        if tg == 0:
-            res = res[1:]
-        elif tg == 1:
-            res = res[1:4] + [(res[4], res[5], res[6], res[7])] + res[8:]
-        else:
-            res = res[1:4] + [(res[4], res[5], res[6], res[7]), (res[8], res[9], res[10], res[11])] + res[12:]
-        if self.debug: print(f"General status: {res}")
-        return res
+        out = [res[1], res[2], tg]
+        i = 4
+        for _ in range(min(tg, 2)):
+            out.append((res[i], res[i + 1], res[i + 2], res[i + 3]))
+            i += 4
+        out.extend(res[i:])
+        if _DEBUG and self.debug: print(f"General status: {out}")
+        return out
 
     def set_mode(self, mode=0x01):
         """
         Sets the SAM_Configuration mode to 1 to initiate PCD mode, raises an error if it failed
         refers to the PN532 user-guide for more details about modes
         """
-        if self.debug: print(f"Setting device mode to {mode} ...")
+        if _DEBUG and self.debug: print(f"Setting device mode to {mode} ...")
         self.write_cmd(_CMD_SAM_CONFIGURATION, [mode, 0x00])
         if not self.wait_ready(): raise OSError("Device not ready")
         res = self.read_frame()
@@ -181,14 +269,14 @@ class PN532_I2C:
         Listen for a given amount of time for passive targets
         if none are detected within timeout return an empty list
         else return an array that contains the target logical number, SENS_RES, SEL_RES, and the UID of the detected card
-        UID is returned as an array of integers where each element represent a byte
+        UID is returned as a bytes object
         raises an error if the operation fails or more than one target is detected
         **currently it only supports ISO/IEC14443 Type A targets
         """
-        if self.debug: print("Listing Passive Targets ...")
+        if _DEBUG and self.debug: print("Listing Passive Targets ...")
         self.write_cmd(_CMD_InListPassiveTarget, [0x01, 0x00])
         if not self.wait_ready(timeout):
-            if self.debug: print("No Device detected")
+            if _DEBUG and self.debug: print("No Device detected")
             self.abort_cmd()
             return []
         res = self.read_frame()
@@ -199,16 +287,16 @@ class PN532_I2C:
         uid_len = res[6]
         if uid_len > 7:
             raise OSError("The card's UID is too long")
-        return [res[2], int.from_bytes(res[3:5]), res[5], list(res[7:7 + uid_len])]
+        return [res[2], (res[3] << 8) | res[4], res[5], bytes(res[7:7 + uid_len])]
 
     def mifare_classic_auth(self, uid, tg, key, key_type, block):
         """
         Send a MIFARE authentification command to the card with a given UID and tg logical number using the given key and key type on the given block
-        key and uid should be given as arrays of integers where each element represent a byte
+        key and uid should be given as arrays of integers or bytes-like objects where each element represent a byte
         raises an error if the operation fails
         """
-        if self.debug: print(f"Mifare authentification with key {key} on block {block} ...")
-        param = [0] * 13
+        if _DEBUG and self.debug: print(f"Mifare authentification with key {key} on block {block} ...")
+        param = self._parambuf
         param[0] = tg
         if key_type == A:
             param[1] = _MIFARE_AUTH_A
@@ -217,9 +305,11 @@ class PN532_I2C:
         else:
             raise OSError("Invalid key type")
         param[2] = block
-        param[3:9] = key
-        param[9:13] = uid
-        self.write_cmd(_CMD_InDataExchange, param)
+        n = 9 + len(uid)
+        mv = memoryview(param)
+        mv[3:9] = bytes(key)
+        mv[9:n] = bytes(uid)
+        self.write_cmd(_CMD_InDataExchange, mv[:n])
         if not self.wait_ready(): raise OSError("Device not ready")
         res = self.read_frame(3)
         if res[0] != _CMD_InDataExchange + 1:
@@ -233,16 +323,21 @@ class PN532_I2C:
         returns a bytes object containing the 16 bytes read from the block
         raises an error if the operation fails
         """
-        if self.debug: print(f"Reading from block {block} ...")
-        self.write_cmd(_CMD_InDataExchange, [tg, _MIFARE_READ, block])
+        if _DEBUG and self.debug: print(f"Reading from block {block} ...")
+        param = self._parambuf
+        param[0] = tg
+        param[1] = _MIFARE_READ
+        param[2] = block
+        self.write_cmd(_CMD_InDataExchange, memoryview(param)[:3])
         if not self.wait_ready(): raise OSError("Device not ready")
         res = self.read_frame()
         if res[0] != _CMD_InDataExchange + 1:
             raise OSError("Invalid response")
         if res[1] & 0x3F != 0x00:
             raise OSError("Command failed")
-        if self.debug: print(f"Data read: {res[2:18]}")
-        return res[2:18]
+        data = bytes(res[2:18])
+        if _DEBUG and self.debug: print(f"Data read: {data}")
+        return data
 
     def mifare_classic_write(self, tg, block, data):
         """
@@ -250,16 +345,19 @@ class PN532_I2C:
         data should be a bytes object containing up to 16 bytes to write to the block
         raises an error if the operation fails or the data size is greater than 16
         """
-        if self.debug: print(f"Writing to block {block} ...")
-        param = [0] * 19
+        if _DEBUG and self.debug: print(f"Writing to block {block} ...")
+        n = len(data)
+        if n > 16:
+            raise OSError("data length exceeds 16 bytes")
+        param = self._parambuf
         param[0] = tg
         param[1] = _MIFARE_WRITE
         param[2] = block
-        if len(data) > 16:
-            raise OSError("data length exceeds 16 bytes")
-        else:
-            param[3:19] = list(data) + [0x00] * (16 - len(data))
-        self.write_cmd(_CMD_InDataExchange, param)
+        mv = memoryview(param)
+        mv[3:3 + n] = bytes(data)
+        for i in range(3 + n, 19):
+            param[i] = 0x00
+        self.write_cmd(_CMD_InDataExchange, mv)
         if not self.wait_ready(): raise OSError("Device not ready")
         res = self.read_frame()
         if res[0] != _CMD_InDataExchange + 1:
@@ -272,7 +370,7 @@ class PN532_I2C:
         Put the device into low power mode and set the wakeup causes
         Refers to the PN532 user-guide for more details about wakeup causes
         """
-        if self.debug: print("Putting Device into low power mode ...")
+        if _DEBUG and self.debug: print("Putting Device into low power mode ...")
         self.write_cmd(_CMD_PowerDown, [wakeup_causes])
         if not self.wait_ready(): raise OSError("Device not ready")
         res = self.read_frame()
@@ -286,7 +384,7 @@ class PN532_I2C:
         """
         Wakeup the device by sending a dummy I2C request (ACK)
         """
-        if self.debug: print("Waking up device ...")
+        if _DEBUG and self.debug: print("Waking up device ...")
         self.write_rawdata(_ACK)
         sleep_ms(50)
         self.pow_down = False
@@ -295,5 +393,5 @@ class PN532_I2C:
         """
         Abort the current command by sending an ACK
         """
-        if self.debug: print("Sending ACK to abort ...")
+        if _DEBUG and self.debug: print("Sending ACK to abort ...")
         self.write_rawdata(_ACK)
@@ -1,7 +1,9 @@
 from typing import Any, List, Optional, Tuple, Union
 
+_DEBUG: int
 _ACK: bytes
 _NACK: bytes
+_ACK_WITH_RDY: bytes
 _PN532_ADDR: int
 _PREAMBLE: int
 _POSTAMBLE: int
@@ -9,6 +11,7 @@ _START_CODE_1: int
 _START_CODE_2: int
 _TFI_H2M: int
 _TFI_M2H: int
+_HDR: bytes
 _CMD_GetFirmwareVersion: int
 _CMD_GetGeneralStatus: int
 _CMD_SAM_CONFIGURATION: int
@@ -27,6 +30,16 @@ B: int
 DEFAULT_KEYA: List[int]
 DEFAULT_KEYB: List[int]
 
+def _bsum(buf: Any, n: int) -> int:
+    """Sums the first n bytes of a buffer modulo 256."""
+    ...
+
+_FRAME_ERRORS: Tuple[str, ...]
+
+def _parse_frame(p: Any, n: int) -> int:
+    """Validates a received frame and returns its length or a negative error code."""
+    ...
+
 class PN532_I2C:
     i2c: Any
     debug: bool
@@ -38,19 +51,25 @@ class PN532_I2C:
     def write_rawdata(self, data: bytes) -> int:
         """Writes raw data to the I2C bus."""
         ...
-    def read_rawdata(self, n: int = 6, retries: int = 6, retry_delay: int = 10) -> bytes:
+    def read_rawdata(self, n: int = 6, retries: int = 6, retry_delay: int = 10) -> memoryview:
         """Reads raw data from the I2C bus with retries."""
         ...
-    def read_frame(self, n: int = 32) -> bytes:
+    def read_rawdata_try(self, n: int = 1) -> Optional[memoryview]:
+        """Reads raw data from the I2C bus once, returning None on failure."""
+        ...
+    def read_frame(self, n: int = 32) -> memoryview:
         """Reads a complete data frame from the PN532."""
         ...
+    def read_ack(self) -> bytearray:
+        """Reads the ready byte and ACK frame without retries."""
+        ...
     def wait_ready(self, timeout: int = 1000, retry_delay: int = 5) -> bool:
         """Waits for the PN532 to be ready to receive a command."""
         ...
-    def write_cmd(self, cmd: int, params: Optional[List[int]] = None) -> None:
+    def write_cmd(self, cmd: int, params: Optional[Union[List[int], bytes, bytearray, memoryview]] = None) -> None:
         """Writes a command to the PN532."""
         ...
-    def firmware_version(self) -> str:
+    def firmware_version(self) -> bytes:
         """Gets the firmware version of the PN532."""
         ...
     def general_status(self) -> List[Union[int, Tuple[int, int, int, int]]]:
@@ -59,10 +78,10 @@ class PN532_I2C:
     def set_mode(self, mode: int = 1) -> None:
         """Sets the SAM (Secure Access Module) configuration mode."""
         ...
-    def list_passive_target(self, timeout: int = 3000) -> List[Union[int, List[int]]]:
+    def list_passive_target(self, timeout: int = 3000) -> List[Union[int, bytes]]:
         """Lists available passive NFC targets."""
         ...
-    def mifare_classic_auth(self, uid: List[int], tg: int, key: List[int], key_type: int, block: int) -> None:
+    def mifare_classic_auth(self, uid: Union[List[int], bytes], tg: int, key: Union[List[int], bytes], key_type: int, block: int) -> None:
         """Authenticates a MIFARE Classic card block."""
         ...
     def mifare_classic_read(self, tg: int, block: int) -> bytes: